@@ -1,10 +1,12 @@
 #-*- coding: utf-8 -*-
 
 from sqlalchemy import create_engine
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy_utils import database_exists, drop_database, create_database
 import pandas as pd
 import numpy as np
 import sys
+import os
 
 
 class Engine:
@@ -149,6 +151,97 @@ class Engine:
         return
 
 
+    def read_table(self, table, columns=None):
+        """
+        Read a table, or a subset of its columns, into a data frame using a plain SELECT
+        query. Unlike pd.read_sql_table, this avoids reflecting the table schema on
+        every read. Any DATE column is parsed to datetimes.
+        """
+        cols = '*' if columns is None else ', '.join('`%s`' % col for col in columns)
+        try:
+            df = pd.read_sql_query('SELECT %s FROM `%s`;' % (cols, table), self.engine)
+        except (SQLAlchemyError, pd.io.sql.DatabaseError) as err:
+            raise ValueError('Could not read from table %s: %s' % (table, err))
+        # Without the schema, columns that are entirely NULL (e.g. stations with no
+        # data) come back as objects, so convert them to float NaN
+        for col in df.columns[(df.dtypes == object) & df.isna().all().values]:
+            if col != 'DATE':
+                df[col] = df[col].astype(float)
+        if 'DATE' in df:
+            df['DATE'] = pd.to_datetime(df['DATE'], format='%Y-%m-%d %H:%M:%S.%f')
+        return df
+
+
+    def copy_table(self, table, dest, columns=None):
+        """
+        Copy a table, or a subset of its columns, from this database to the database of
+        another Engine, replacing any existing table. If both are SQLite database files,
+        the copy is done within SQLite by attaching this database and re-creating the
+        table from it. A full copy keeps the original schema and indices, while a subset
+        keeps the declared types of its columns. Otherwise, the table is copied through
+        a data frame.
+        """
+        src_path = self.engine.url.database
+        dst_path = dest.engine.url.database
+        sqlite_files = (self.engine.dialect.name == 'sqlite' and
+                        dest.engine.dialect.name == 'sqlite' and
+                        src_path not in (None, '', ':memory:') and
+                        dst_path not in (None, '', ':memory:'))
+
+        # If both engines point to the same file, a full copy has nothing to do
+        same_file = sqlite_files and os.path.realpath(src_path) == os.path.realpath(dst_path)
+        if same_file and columns is None:
+            return
+
+        if not sqlite_files or same_file:
+            df = self.read_table(table, columns=columns)
+            df.to_sql(table, dest.engine, if_exists='replace', index=False)
+            return
+
+        conn = dest.engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('ATTACH DATABASE ? AS src;', (src_path,))
+            try:
+                if columns is None:
+                    # Get the statements that created the table and its indices
+                    cursor.execute("SELECT sql FROM src.sqlite_master WHERE tbl_name = ? "
+                                   "AND sql IS NOT NULL ORDER BY type DESC;", (table,))
+                    statements = [row[0] for row in cursor.fetchall()]
+                    if len(statements) < 1:
+                        raise ValueError('Table %s not found' % table)
+                    select = '*'
+                else:
+                    # Make a statement creating the subset of columns with their types
+                    cursor.execute('PRAGMA src.table_info("%s");' % table)
+                    types = {row[1]: row[2] for row in cursor.fetchall()}
+                    missing = [col for col in columns if col not in types]
+                    if len(types) < 1 or len(missing) > 0:
+                        raise ValueError('Could not find columns %s in table %s' %
+                                         (missing, table))
+                    select = ', '.join('"%s"' % col for col in columns)
+                    statements = ['CREATE TABLE main."%s" (%s);' % (table,
+                        ', '.join('"%s" %s' % (col, types[col]) for col in columns))]
+
+                # Re-create the table and copy the rows in a single transaction
+                cursor.execute('BEGIN;')
+                cursor.execute('DROP TABLE IF EXISTS main."%s";' % table)
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute('INSERT INTO main."%s" SELECT %s FROM src."%s";' %
+                               (table, select, table))
+                conn.commit()
+            except:
+                conn.rollback()
+                raise
+            finally:
+                cursor.execute('DETACH DATABASE src;')
+        finally:
+            conn.close()
+
+        return
+
+
     def tables(self, asarray=False):
         """
         Get list of tables stored in a SQL database.
@@ -3,6 +3,8 @@
 import numpy as np
 import datetime as dtime
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from tqdm import tqdm
 import sys
 
@@ -138,90 +140,113 @@ class Interface:
 
 
     def subset_table(self, idlist, engine_out, tstart=None, tend=None, filelist=[],
-                     scale=1.0, block_size=10):
+                     scale=1.0, block_size=10, workers=1):
         """
         Subset a raw data table using a list of station IDs, and perform
-        an outer join using the dates.
+        an outer join using the dates. If workers > 1, the components are read and
+        merged concurrently in separate processes, while all writes to engine_out
+        are done by the calling process.
         """
-        from functools import reduce
-
         print('\nSubsetting network to %d stations' % len(idlist))
         # First trim the file list (if provided) to keep only the files associated 
         # with the list of stations
         print(' - subsetting files first')
         engine_out.addFile(filelist)
 
-        # Loop over the components
-        query = "SELECT DATE, %s, sigma_%s FROM tseries WHERE id = '%s';"
-        for component in self.inst.components:
-
-            print(' - subsetting component', component)
-
-            # Loop over the stations
-            print(' - merging stations')
-            data_df = []; sigma_df = []
-            for i, statname in enumerate(idlist):
-                
-                # Query database for current station+component 
-                data = pd.read_sql_query(query % (component, component, statname),
-                                         self.engine.engine)
-                new_data_df = data[['DATE', component]]
-                new_sigma_df = data[['DATE', 'sigma_' + component]]
-
-                # Use station name in columns as a unique identifier
-                new_data_df.columns = ['DATE', statname]
-                new_sigma_df.columns = ['DATE', statname]
-
-                # Scale the data
-                new_data_df[statname].values[:] *= scale
-                new_sigma_df[statname].values[:] *= scale
-
-                # Remove duplicates
-                duplicated = new_data_df.duplicated('DATE')
-                new_data_df = new_data_df.loc[np.invert(duplicated),:]
-                new_sigma_df = new_sigma_df.loc[np.invert(duplicated),:]
-
-                # Append results
-                data_df.append(new_data_df)
-                sigma_df.append(new_sigma_df)
-    
-            # Reduce to make single data frame for current component
-            data_df = reduce(lambda left,right: pd.merge(left, right, how='outer',
-                             on='DATE'), data_df)
-            sigma_df = reduce(lambda left,right: pd.merge(left, right, how='outer',
-                              on='DATE'), sigma_df)
-
-            # Set the DATE column to be the index in order to resample
-            data_df.index = pd.to_datetime(data_df['DATE'], format='%Y-%m-%d %H:%M:%S.%f')
-            sigma_df.index = pd.to_datetime(sigma_df['DATE'], format='%Y-%m-%d %H:%M:%S.%f')
-
-            # Subset data by a time window
-            ind = None
-            if tstart is not None:
-                ind  = data_df.index > np.datetime64(tstart)
-            if tend is not None:
-                ind *= data_df.index < np.datetime64(tend)
-            if ind is not None:
-                data_df = data_df[ind]
-                sigma_df = sigma_df[ind]
- 
-            # Resample to an evenly spaced date range
-            data_df = data_df.resample('D').mean().reset_index()
-            sigma_df = sigma_df.resample('D').mean().reset_index()
-
-            # Make date a separate column again
-            data_df.rename(columns={'index': 'DATE'}, inplace=True)
-            sigma_df.rename(columns={'index': 'DATE'}, inplace=True)
-
-            # Save to table
-            data_df.reset_index(drop=True).to_sql(component, engine_out.engine,
-                                                  if_exists='replace')
-            sigma_df.reset_index(drop=True).to_sql('sigma_' + component, engine_out.engine,
-                                                   if_exists='replace')
+        # Make a reader for a single component
+        components = list(self.inst.components)
+        reader = partial(subset_component, idlist=idlist, tstart=tstart, tend=tend,
+                         scale=scale)
+
+        # Worker processes open their own connections using the database url
+        if workers > 1 and len(components) > 1:
+            url = self.engine.url
+            if hasattr(url, 'render_as_string'):
+                url = url.render_as_string(hide_password=False)
+            executor = ProcessPoolExecutor(max_workers=min(workers, len(components)))
+            results = executor.map(reader, [str(url)] * len(components), components)
+        else:
+            executor = None
+            results = map(reader, [self.engine] * len(components), components)
+
+        # Loop over the components and save to tables as they become available
+        try:
+            for component, (data_df, sigma_df) in zip(components, results):
+                data_df.to_sql(component, engine_out.engine, if_exists='replace')
+                sigma_df.to_sql('sigma_' + component, engine_out.engine,
+                                if_exists='replace')
+        finally:
+            if executor is not None:
+                executor.shutdown()
 
         return
 
 
+def subset_component(engine, component, idlist, tstart=None, tend=None, scale=1.0):
+    """
+    Read the data and uncertainties of a single component for a list of station IDs
+    from the raw data table, and merge and resample them to daily data frames with
+    one column per station. The engine can be an Engine instance or a database url.
+    """
+    if isinstance(engine, str):
+        from .Engine import Engine
+        engine = Engine(url=engine)
+
+    print(' - subsetting component', component)
+
+    # Query database once for all stations for current component
+    query = "SELECT DATE, id, %s, sigma_%s FROM tseries WHERE id IN (%s);"
+    id_str = ','.join("'%s'" % statname for statname in idlist)
+    data = pd.read_sql_query(query % (component, component, id_str), engine.engine)
+
+    # Remove duplicates
+    data = data.drop_duplicates(subset=['id', 'DATE'])
+
+    # Pivot to a single data frame for current component, using station
+    # name in columns as a unique identifier
+    print(' - merging stations')
+    data_df = data.pivot(index='DATE', columns='id', values=component)
+    sigma_df = data.pivot(index='DATE', columns='id', values='sigma_' + component)
+    del data
+
+    # Keep the station ordering and scale the data
+    data_df = scale * data_df.reindex(columns=idlist)
+    sigma_df = scale * sigma_df.reindex(columns=idlist)
+    data_df.columns.name = sigma_df.columns.name = None
+
+    # Convert the DATE index to datetimes in order to resample
+    data_df.index = pd.to_datetime(data_df.index, format='%Y-%m-%d %H:%M:%S.%f')
+    sigma_df.index = pd.to_datetime(sigma_df.index, format='%Y-%m-%d %H:%M:%S.%f')
+
+    # Subset data by a time window
+    ind = None
+    if tstart is not None:
+        ind  = data_df.index > np.datetime64(tstart)
+    if tend is not None:
+        ind *= data_df.index < np.datetime64(tend)
+    if ind is not None:
+        data_df = data_df[ind]
+        sigma_df = sigma_df[ind]
+
+    # Resample to an evenly spaced date range. If there is already at most
+    # one epoch per day, a reindex onto the daily range is sufficient
+    days = data_df.index.normalize()
+    if days.is_unique and len(days) > 0:
+        full_days = pd.date_range(days[0], days[-1], freq='D', name='DATE')
+        data_df.index = sigma_df.index = days
+        data_df = data_df.reindex(full_days)
+        sigma_df = sigma_df.reindex(full_days)
+    else:
+        data_df = data_df.resample('D').mean()
+        sigma_df = sigma_df.resample('D').mean()
+
+    # Make date a separate column again
+    data_df = data_df.reset_index()
+    sigma_df = sigma_df.reset_index()
+
+    return data_df, sigma_df
+
+
 def save_block(data_df, sigma_df, engine, block_cnt):
 
     data_df = reduce(lambda left,right: pd.merge(left, right, how='outer',
@@ -90,19 +90,11 @@ class STN:
         elif 'usgs' in format:
             fname = '%s/%s.rneu' % (gpsdir, stname.lower())
             if os.path.isfile(fname):
-                fid = open(fname, 'r')
-                data = []
-                for line in fid:
-                    linedat = line.split()
-                    t = float(linedat[1])
-                    e,n,u = [float(val) for val in linedat[2:5]]
-                    se,sn,su = [float(val)**2 for val in linedat[6:9]]
-                    data.append([t,e,n,u,se,sn,su])
-                fid.close()
-                data = np.array(data)
-                self.tdec = data[:,0]
-                self.north, self.east, self.up = data[:,1], data[:,2], data[:,3]
-                self.sn, self.se, self.su = data[:,4], data[:,5], data[:,6]
+                t,n,e,u,dnor,deas,dup = np.loadtxt(fname, usecols=(1,2,3,4,6,7,8),
+                                                   unpack=True, ndmin=2)
+                self.tdec = t
+                self.north, self.east, self.up = n, e, u
+                self.sn, self.se, self.su = dnor**2, deas**2, dup**2
             else:
                 self.success = False
 
@@ -125,3 +117,23 @@ class STN:
 
         return
 
+
+    @classmethod
+    def load_many(cls, stnames, gpsdir, nproc=None, **kwargs):
+        """
+        Load a list of stations in parallel using a pool of processes, since every
+        station is read independently from its own file. Keyword arguments are passed
+        to the STN constructor (and must be picklable, e.g. no lambda txtreader).
+        Returns a list of STN objects in the same order as stnames.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        from functools import partial
+
+        stnames = list(stnames)
+        nproc = nproc or os.cpu_count() or 1
+        chunksize = max(1, len(stnames) // (4 * nproc))
+
+        loader = partial(cls, gpsdir=gpsdir, **kwargs)
+        with ProcessPoolExecutor(max_workers=nproc) as executor:
+            return list(executor.map(loader, stnames, chunksize=chunksize))
+
@@ -150,9 +150,9 @@ class TimeSeries:
         for statname, stat in self.statGen:
             self.name.append(statname)
             if type(stat['lat']) in [h5py.Dataset, h5py.Group]:
-                self.lat.append(stat['lat'].value)
-                self.lon.append(stat['lon'].value)
-                self.elev.append(stat['elev'].value)
+                self.lat.append(stat['lat'][()])
+                self.lon.append(stat['lon'][()])
+                self.elev.append(stat['elev'][()])
             else:
                 self.lat.append(stat['lat'])
                 self.lon.append(stat['lon'])
@@ -238,10 +238,10 @@ class TimeSeries:
                 if type(value) == h5py.Group:
                     group = {}
                     for gkey, gvalue in value.items():
-                        group[gkey] = gvalue.value
+                        group[gkey] = gvalue[()]
                     data[key] = group
                 else:
-                    data[key] = value.value
+                    data[key] = value[()]
         return data
         
 
@@ -335,11 +335,12 @@ class TimeSeries:
         """
         Remove the mean of the finite values in each component of displacement.
         """
-        from scipy.stats import nanmean
         for statname, stat in self.statGen:
             for component in self.components:
-                dat = getattr(self, component)
-                dat -= nanmean(dat)
+                # Read a copy first, since h5py datasets do not support in-place updates
+                dat = stat[component][()]
+                dat -= np.nanmean(dat)
+                stat[component][...] = dat
         return
 
 
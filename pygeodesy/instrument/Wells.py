@@ -57,9 +57,9 @@ class Wells(TimeSeries):
                     # Empty station dictionary
                     stat = {}
                     # Load data
-                    datestr = group['dates'].value.astype(str)
-                    data = group['ts'].value
-                    range_vals = group['range'].value
+                    datestr = group['dates'][()].astype(str)
+                    data = group['ts'][()]
+                    range_vals = group['range'][()]
                     # Convert data to meters
                     data *= 0.3048
                     # Make decimal year for each epoch
@@ -38,12 +38,14 @@ class Model:
         # Evaluate the collection
         self.G = self.collection(t)
 
-        # Get indices for the functional partitions
+        # Get indices for the functional partitions. Contiguous partitions are stored
+        # as slices so that selecting columns of G gives views instead of copies, and
+        # any others as integer arrays
         fnParts = timefn.getFunctionTypes(self.collection)
         for key in ('secular', 'seasonal', 'transient', 'step'):
-            setattr(self, 'i%s' % key, fnParts[key])
+            setattr(self, 'i%s' % key, self._asSlice(fnParts[key]))
         self.npar = self.G.shape[1]
-        self.ifull = np.arange(self.npar, dtype=int)
+        self.ifull = np.arange(self.npar, dtype=np.intp)
         self._updatePartitionSizes()
 
         # Make mask for time window for estimating parameters
@@ -66,10 +68,24 @@ class Model:
         """
         for attr in ('secular', 'seasonal', 'transient', 'step', 'full'):
             ind_list = getattr(self, 'i%s' % attr)
+            if isinstance(ind_list, slice):
+                ind_list = range(*ind_list.indices(self.npar))
             setattr(self, 'n%s' % attr, len(ind_list))
         return
 
 
+    @staticmethod
+    def _asSlice(ind_list):
+        """
+        Convert a list of indices to a slice if the indices are contiguous and
+        increasing. Otherwise, the indices are returned as an integer array.
+        """
+        ind = np.asarray(ind_list, dtype=np.intp)
+        if ind.size > 0 and np.all(np.diff(ind) == 1):
+            return slice(int(ind[0]), int(ind[-1]) + 1)
+        return ind
+
+
     def invert(self, solver, d, wgt=None):
         """
         Perform least squares inversion using a solver.
@@ -156,22 +172,32 @@ class Model:
         Parameters
         ----------
         mvec: np.ndarray
-            Array of parameters.
+            Array of parameters. Can be 2D of shape (npar, nstat) to predict
+            the time series for several stations with a single matrix product
+            per partition.
+        out: dict, optional
+            Dictionary to store the functional partitions in. Any arrays already in
+            the dictionary are overwritten in place, and missing ones are allocated
+            and added, so that the same dictionary can be reused over many calls.
+        sigma: bool, optional
+            Compute prediction uncertainty if a covariance matrix is available.
         """
 
         # Compute different components
-        secular = np.dot(self.G[:,self.isecular], mvec[self.isecular])
-        seasonal = np.dot(self.G[:,self.iseasonal], mvec[self.iseasonal])
-        transient = np.dot(self.G[:,self.itransient], mvec[self.itransient])
-        step = np.dot(self.G[:,self.istep], mvec[self.istep])
+        results = {} if out is None else out
+        for key in ('secular', 'seasonal', 'transient', 'step'):
+            ind = getattr(self, 'i%s' % key)
+            results[key] = np.dot(self.G[:,ind], mvec[ind], out=results.get(key))
 
-        # Compute the functional partitions
-        results = {'secular': secular, 'seasonal': seasonal, 'transient': transient,
-            'step': step, 'full': secular + seasonal + transient + step}
+        # Compute the full prediction
+        full = np.add(results['secular'], results['seasonal'], out=results.get('full'))
+        full += results['transient']
+        full += results['step']
+        results['full'] = full
 
-        # Add uncertainty if applicable
+        # Add uncertainty if applicable (only the diagonal of G*Cm*G^T is needed)
         if hasattr(self, 'Cm') and sigma:
-            sigma = np.sqrt(np.diag(np.dot(self.G, np.dot(self.Cm, self.G.T))))
+            sigma = np.sqrt(np.einsum('ij,ij->i', np.dot(self.G, self.Cm), self.G))
             results['sigma'] = sigma
 
         return results
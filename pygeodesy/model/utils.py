@@ -0,0 +1,78 @@
+#-*- coding: utf-8 -*-
+
+import numpy as np
+import importlib.machinery
+import importlib.util
+
+from giant.utilities import timefn
+
+
+def load_collection(dates, userfile, identity_prior=False):
+    """
+    Load the collection and the prior covariance matrix.
+
+    Parameters
+    ----------
+    dates: array type
+        Array of observation times as datetime objects.
+    userfile: str
+        Python file defining build(dates) and optionally computeCm(collection).
+    identity_prior: bool, optional
+        Return an identity matrix for the inverse prior covariance if the user file
+        does not define one. Otherwise, None is returned. Default: False.
+    """
+    print('Loading collection')
+
+    # Load the user module once for both the collection and the prior. The loader is
+    # given explicitly so that files without a .py extension are accepted
+    collfun = None
+    if userfile is not None:
+        try:
+            loader = importlib.machinery.SourceFileLoader('build', userfile)
+            spec = importlib.util.spec_from_loader('build', loader)
+            collfun = importlib.util.module_from_spec(spec)
+            loader.exec_module(collfun)
+        except Exception as err:
+            print(' - could not load user file %s: %s' % (userfile, err))
+            collfun = None
+
+    try:
+        collection = collfun.build(dates)
+    except Exception as err:
+        if collfun is not None:
+            print(' - could not build collection from %s: %s' % (userfile, err))
+        print(' - loading default')
+        collection = loadDefaultCollection(dates)
+    npar = len(collection)
+
+    # Also try to build a prior covariance matrix
+    try:
+        Cm = collfun.computeCm(collection)
+        iCm = np.linalg.inv(Cm)
+    except Exception:
+        iCm = np.eye(npar) if identity_prior else None
+
+    return collection, iCm
+
+
+def loadDefaultCollection(t):
+    """
+    Load default time function collection.
+    """
+    tstart, tend = t[0], t[-1]
+
+    collection = timefn.TimefnCollection()
+    poly = timefn.fnmap['poly']
+    ispl = timefn.fnmap['isplineset']
+    periodic = timefn.fnmap['periodic']
+
+    collection.append(poly(tref=tstart, order=1, units='years'))
+    collection.append(periodic(tref=tstart, units='weeks', period=0.5, tmin=tstart, tmax=tend))
+    collection.append(periodic(tref=tstart, units='weeks', period=1.0, tmin=tstart, tmax=tend))
+    for nspl in [32, 16, 8, 4]:
+        collection.append(ispl(order=3, num=nspl, units='years', tmin=tstart, tmax=tend))
+
+    return collection
+
+
+# end of file
@@ -1,14 +1,20 @@
 #-*- coding: utf-8 -*-
 
 import numpy as np
-import datetime as dtime
+from numpy.lib.stride_tricks import sliding_window_view
 from mpi4py import MPI
 import pandas as pd
 import shutil
 import h5py
 import sys
 
-from ..utilities import datestr2tdec
+# Optional rolling median for the median filter
+try:
+    import bottleneck as bn
+except ImportError:
+    bn = None
+
+from ..utilities import dates2tdec, blockPartition
 
 
 class Network:
@@ -33,13 +39,40 @@ class Network:
         self.inst = instrument
         self.engine = engine 
 
-        # Get list of tables in database
-        self.table_df = pd.read_sql_query("SELECT name FROM sqlite_master "
-            "WHERE type='table' ORDER BY name;", self.engine.engine)
+        # Only the master reads the table list, metadata and observation dates from
+        # the database, which are then broadcast to the other ranks
+        if self.rank == 0:
+
+            # Get list of tables in database
+            table_df = pd.read_sql_query("SELECT name FROM sqlite_master "
+                "WHERE type='table' ORDER BY name;", self.engine.engine)
+
+            # Read metadata
+            meta = pd.read_sql_table('metadata', self.engine.engine,
+                columns=['id','lat','lon','elev'])
+
+            # Get the observation dates in first valid table
+            dates = None
+            for table in self.engine.tables().values:
+                try:
+                    dates = pd.read_sql_table(table[0], self.engine.engine,
+                        columns=['DATE'])['DATE']
+                except:
+                    continue
+                dates = pd.DatetimeIndex(pd.to_datetime(dates)).to_pydatetime()
+                break
+
+            init = (table_df, meta, dates)
+        else:
+            init = None
+        table_df, meta, dates = self.comm.bcast(init, root=0)
 
-        # Read metadata and save to self
-        self.meta = pd.read_sql_table('metadata', self.engine.engine,
-            columns=['id','lat','lon','elev'])
+        # Save the table list
+        self.table_df = table_df
+        self.tables = frozenset(self.table_df['name'])
+
+        # Save metadata to self
+        self.meta = meta
         self.names = self.meta['id'].values
         for key in ('lat','lon','elev'):
             setattr(self, key, self.meta[key].values.astype(float))
@@ -47,21 +80,11 @@ class Network:
         if self.rank == 0:
             print(' - number of stations:', self.nstat)
 
-        # Save the observation dates in first valid table
-        for table in self.engine.tables().values:
-            try:
-                dates = pd.read_sql_table(table[0], self.engine.engine,
-                    columns=['DATE']).values
-            except:
-                continue
-            dates = np.array([pd.to_datetime(date, infer_datetime_format=True)
-                for date in dates])
-            self.dates = np.array([dtime.datetime.utcfromtimestamp(date.astype('O') / 1.0e9)
-                for date in dates])
-            break
+        # Save the observation dates
+        self.dates = dates
 
         # Convert dates to decimal year and save
-        self.tdec = np.array([datestr2tdec(pydtime=date) for date in self.dates])
+        self.tdec = dates2tdec(self.dates)
 
         return
 
@@ -83,18 +106,18 @@ class Network:
         # Load data frame
         if type(statid) in (list, tuple, np.ndarray):
             cols = ['DATE'] + list(statid) if with_date else statid
-            df = pd.read_sql_table(component, self.engine.engine, columns=cols)
+            df = self.engine.read_table(component, columns=cols)
         elif type(statid) is str:
             cols = ['DATE', statid] if with_date else [statid,]
-            df = pd.read_sql_table(component, self.engine.engine, columns=cols)
+            df = self.engine.read_table(component, columns=cols)
         elif statid is None:
             cols = ['DATE'] + list(self.names) if with_date else self.names
-            df = pd.read_sql_table(component, self.engine.engine, columns=cols)
+            df = self.engine.read_table(component, columns=cols)
         
-        # Apply scale parameter
-        for key in df:
-            if key != 'DATE':
-                df[key] *= scale
+        # Apply scale parameter to all station columns at once
+        if scale != 1.0:
+            cols = df.columns[df.columns != 'DATE']
+            df[cols] = df[cols].values * scale
 
         return df
 
@@ -119,27 +142,35 @@ class Network:
         size to create the partitions if npart is not provided.
         """
         N = npart or self.size
-        nominal_load = self.nstat // N
-        if self.rank == self.size - 1:
-            procN = self.nstat - self.rank * nominal_load
-        else:
-            procN = nominal_load
-        istart = self.rank * nominal_load
-        self.sub_names = self.names[istart:istart+procN]
-        self.sub_lon = self.lon[istart:istart+procN]
-        self.sub_lat = self.lat[istart:istart+procN]
-        return self.comm.allgather(procN)
+        counts, offsets = blockPartition(self.nstat, N)
+        istart, iend = offsets[min(self.rank, N)], offsets[min(self.rank + 1, N)]
+        self.sub_names = self.names[istart:iend]
+        self.sub_lon = self.lon[istart:iend]
+        self.sub_lat = self.lat[istart:iend]
+        return counts.tolist()
 
 
-    def zeroMeanDisplacements(self):
+    def zeroMeanDisplacements(self, engine_out):
         """
-        Remove the mean of the finite values in each component of displacement.
+        Remove the mean of the finite values in each component of displacement for
+        all stations, and write the results to engine_out.
         """
-        from scipy.stats import nanmean
-        for statname, stat in self.statGen:
-            for component in self.components:
-                dat = getattr(self, component)
-                dat -= nanmean(dat)
+        for component in self.inst.components:
+
+            # Read data for all stations and remove the mean of each column
+            comp_df = self.get(component, None, with_date=True)
+            data = comp_df[self.names].values.copy()
+            data -= np.nanmean(data, axis=0)
+            comp_df[self.names] = data
+
+            # Read sigmas
+            sigma_df = self.get('sigma_' + component, None, with_date=True)
+
+            # Write data and sigmas to database in a single transaction
+            with engine_out.engine.begin() as conn:
+                comp_df.to_sql(component, conn, if_exists='replace')
+                sigma_df.to_sql('sigma_' + component, conn, if_exists='replace')
+
         return
 
 
@@ -149,74 +180,63 @@ class Network:
         data and weights.
         """
 
-        # Get first station to determine the number of data points
-        for statname in self.names:
-            df = self.get(self.inst.components[0], statname)
-            ndat = df.size
-            break 
-
         # Get components to process
         comps = components or self.inst.components
         ncomp = len(comps)
-
-        # Construct regular arrays
-        nobs = self.nstat * ncomp
-        data = np.empty((ndat, nobs))
-        weights = np.empty((ndat, nobs))
-
-        # Fill them
-        j = 0
-        for component in comps:
-            for statname in self.names:
-                # Get the data
-                dat_df = self.get(component, statname, scale=scale)
-                sig_df = self.get('sigma_' + component, statname, scale=1.0/scale)
-                # Store data
-                data[:,j] = dat_df[statname].values
-                # Compute mean/median weight if specified
-                if sigmas == 'median':
-                    weights[:,j] = 1.0 / np.nanmedian(sig_df[statname].values)
-                elif sigmas == 'mean':
-                    weights[:,j] = 1.0 / np.nanmean(sig_df[statname].values)
-                else:
-                    weights[:,j] = 1.0 / sig_df[statname].values
-                j += 1
-
-        # Custom packaging
-        return_arrs = [data, weights]
-        if order == 'rows':
-            return_arrs = [arr.T.copy() for arr in return_arrs]
-        return return_arrs
+        nstat = self.nstat
+
+        # Fill regular arrays, reading each table once for all stations
+        nobs = nstat * ncomp
+        data = weights = None
+        for i, component in enumerate(comps):
+
+            # Get the data for all stations
+            dat = self.get(component, None, scale=scale)[self.names].values
+            sig = self.get('sigma_' + component, None, scale=1.0/scale)[self.names].values
+
+            # Construct regular arrays using the number of data points in first table.
+            # For row ordering, the arrays are allocated transposed and filled through
+            # transposed views, so that no copy is needed at the end
+            if data is None:
+                ndat = dat.shape[0]
+                shape = (nobs, ndat) if order == 'rows' else (ndat, nobs)
+                data = np.empty(shape)
+                weights = np.empty(shape)
+                data_cols = data.T if order == 'rows' else data
+                weights_cols = weights.T if order == 'rows' else weights
+
+            # Store data
+            cols = slice(i*nstat, (i+1)*nstat)
+            data_cols[:,cols] = dat
+            # Compute mean/median weight if specified. Zero sigmas give infinite weights
+            if sigmas == 'median':
+                sig = np.nanmedian(sig, axis=0)
+            elif sigmas == 'mean':
+                sig = np.nanmean(sig, axis=0)
+            with np.errstate(divide='ignore'):
+                np.reciprocal(sig, out=weights_cols[:,cols])
+
+        return [data, weights]
         
 
     def computeNetworkWeighting(self, smooth=1.0, n_neighbor=3, L0=None):
         """
         Computes the network-dependent spatial weighting based on station/ground locations.
         """
-        import topoutil as tu
-
-        # Allocate array for storing weights
-        dist_weight = np.zeros((self.nstat, self.nstat))
-
-        # Loop over stations
-        rad = np.pi / 180.0
-        for i in range(self.nstat):
-            ref_X = tu.llh2xyz(self.lat[i]*rad, self.lon[i]*rad, self.elev[i])
-            stat_dist = np.zeros((self.nstat,))
-            # Loop over other stations
-            for j in range(self.nstat):
-                if j == i:
-                    continue
-                curr_X = tu.llh2xyz(self.lat[j]*rad, self.lon[j]*rad, self.elev[j])
-                # Compute distance between stations
-                stat_dist[j] = np.linalg.norm(ref_X - curr_X)
-            if L0 is None:
-                # Mean distance to 3 nearest neighbors multipled by a smoothing factor
-                Lc = smooth * np.mean(np.sort(stat_dist)[1:1+n_neighbor])
-                dist_weight[i,:] = np.exp(-stat_dist / Lc)
-                print(' - scale length at', self.names[i], ':', 0.001 * Lc, 'km')
-            else:
-                dist_weight[i,:] = np.exp(-stat_dist / L0)
+        # Compute distances between all pairs of stations
+        stat_dist = self.pairwiseDistances()
+
+        if L0 is None:
+            # Mean distance to 3 nearest neighbors multipled by a smoothing factor. Only
+            # the closest stations (including the station itself) need to be sorted
+            k = min(n_neighbor, self.nstat - 1)
+            nearest = np.sort(np.partition(stat_dist, k, axis=1)[:,:k+1], axis=1)
+            Lc = smooth * np.mean(nearest[:,1:], axis=1)
+            dist_weight = np.exp(-stat_dist / Lc[:,None])
+            for name, L in zip(self.names, Lc):
+                print(' - scale length at', name, ':', 0.001 * L, 'km')
+        else:
+            dist_weight = np.exp(-stat_dist / L0)
 
         return dist_weight
 
@@ -271,11 +291,9 @@ class Network:
 
         # Write to SQL database
         for component in self.inst.components:
-            # Write data
             frames[component].to_sql(component, engine_out.engine, if_exists='replace')
-            # Read and write sigmas
-            sigma_df = pd.read_sql_table('sigma_' + component, self.engine.engine)
-            sigma_df.to_sql('sigma_' + component, engine_out.engine, if_exists='replace')
+            # Sigmas are unchanged, so copy the table directly
+            self.engine.copy_table('sigma_' + component, engine_out)
 
         return
 
@@ -312,7 +330,6 @@ class Network:
 
             # Get data for this component
             comp_df = self.get(component, None, with_date=True)
-            N = comp_df.shape[0]
 
             # Make a copy for filtered results
             filt_df = comp_df.copy()
@@ -324,7 +341,8 @@ class Network:
                 # Get the data
                 data = comp_df[statname].values
                 # Skip if all NaN
-                if np.isnan(data).sum() == N:
+                nan_mask = np.isnan(data)
+                if nan_mask.all():
                     continue
                 # Remove median value
                 data -= np.nanmedian(data)
@@ -332,14 +350,15 @@ class Network:
                 filtered = self.adaptiveMedianFilt(data, kernel_size)
                 # mask
                 if mask:
-                    filtered[np.isnan(data)] = np.nan
-                # Compute residual
+                    filtered[nan_mask] = np.nan
+                # Compute residual and its deviation
                 residual = data - filtered
+                if log or remove_outliers:
+                    std = devfun(residual)
                 # Write deviations to log
-                if log: lfid.write('- %s: %f\n' % (statname, devfun(residual)))
+                if log: lfid.write('- %s: %f\n' % (statname, std))
                 # Remove outliers
                 if remove_outliers:
-                    std = devfun(residual)
                     if std > std_thresh:
                         continue
                     data[np.abs(residual) > nstd*std] = np.nan
@@ -352,15 +371,14 @@ class Network:
             # Update metadata if list of good stations has changed
             self.updateMetadata(keep_stat, engine_out)
 
-            # Write data to database
+            # Write data and filtered data to database in a single transaction
             keep_stat = ['DATE'] + keep_stat
-            comp_df[keep_stat].to_sql(component, engine_out.engine, if_exists='replace')
-            filt_df[keep_stat].to_sql('filt_' + component, 
-                engine_out.engine, if_exists='replace')
+            with engine_out.engine.begin() as conn:
+                comp_df[keep_stat].to_sql(component, conn, if_exists='replace')
+                filt_df[keep_stat].to_sql('filt_' + component, conn, if_exists='replace')
 
-            # Read and write sigmas
-            sigma_df = self.get('sigma_' + component, None, with_date=True)
-            sigma_df.to_sql('sigma_' + component, engine_out.engine, if_exists='replace')
+            # Sigmas are unchanged, so copy the table directly for the kept stations
+            self.engine.copy_table('sigma_' + component, engine_out, columns=keep_stat)
 
         if log:
             lfid.close()
@@ -392,32 +410,20 @@ class Network:
             comp_df = self.get(component, None, with_date=False)
             filt_df = self.get('filt_' + component, None, with_date=False)
 
-            # First loop over the stations to compute residuals; fill
-            # gaps with random noise
-            for statname in self.names:
-                #if component != 'east' and statname != 'cgtc': continue
-                # Get data and filtered data
-                data = comp_df[statname].values
-                filt = filt_df[statname].values
-                # Compute residual
-                residual = data - filt
-                residual -= np.nanmean(residual)
-                # Compute standard deviation of residual
-                #std = np.nanstd(residual)
-                std = np.nanmedian(np.abs(residual - np.nanstd(residual)))
-                # Threshold outliers
-                ind = np.abs(residual) > 4*std
-                residual[ind] = np.nan
-                # Fill in data gaps with Gaussian noise 
-                ind = np.isnan(residual).nonzero()[0]
-                residual[ind] = np.nanstd(residual) * np.random.randn(len(ind))
-                #import matplotlib.pyplot as plt
-                #plt.close('all'); plt.plot(self.tdec, residual, 'o'); plt.show(); sys.exit()
-                # Save final residual
-                comp_df[statname] = residual
+            # Compute residuals for all stations at once
+            residual = comp_df[self.names].values - filt_df[self.names].values
+            residual -= np.nanmean(residual, axis=0)
+            # Compute standard deviation of residual
+            std = np.nanmedian(np.abs(residual - np.nanstd(residual, axis=0)), axis=0)
+            # Threshold outliers
+            residual[np.abs(residual) > 4*std] = np.nan
+            # Fill in data gaps with Gaussian noise
+            ind = np.isnan(residual)
+            noise = np.nanstd(residual, axis=0) * np.random.randn(*residual.shape)
+            residual[ind] = noise[ind]
 
             # Perform decomposition
-            temporal[component] = decomposer.fit_transform(comp_df.values)
+            temporal[component] = decomposer.fit_transform(residual)
             if method == 'pca':
                 spatial[component] = decomposer.components_.squeeze()
                 model[component] = decomposer.inverse_transform(temporal[component])
@@ -445,14 +451,16 @@ class Network:
             for component in self.inst.components:
                 A = model[component]
                 comp_df = self.get(component, None, with_date=True)
-                comp_df.to_sql('raw_' + component, engine_out.engine, if_exists='replace')
-                for cnt, statname in enumerate(self.names):
-                    residual = comp_df.loc[:,statname] - A[:,cnt]
-                    #residual -= np.nanmean(residual)
-                    comp_df.loc[:,statname] = residual
-                comp_df.to_sql(component, engine_out.engine, if_exists='replace')
                 sigma_df = self.get('sigma_' + component, None, with_date=True)
-                sigma_df.to_sql('sigma_' + component, engine_out.engine, if_exists='replace')
+                # Write raw data, corrected data and sigmas in a single transaction
+                with engine_out.engine.begin() as conn:
+                    comp_df.to_sql('raw_' + component, conn, if_exists='replace')
+                    for cnt, statname in enumerate(self.names):
+                        residual = comp_df.loc[:,statname] - A[:,cnt]
+                        #residual -= np.nanmean(residual)
+                        comp_df.loc[:,statname] = residual
+                    comp_df.to_sql(component, conn, if_exists='replace')
+                    sigma_df.to_sql('sigma_' + component, conn, if_exists='replace')
         
         return
 
@@ -514,12 +522,14 @@ class Network:
             for component in self.inst.components:
                 A = model[component]
                 comp_df = self.get(component, None, with_date=True)
-                comp_df.to_sql('raw_' + component, engine_out.engine, if_exists='replace')
-                for cnt, statname in enumerate(self.names):
-                    comp_df.loc[:,statname] -= A[:,cnt]
-                comp_df.to_sql(component, engine_out.engine, if_exists='replace')
                 sigma_df = self.get('sigma_' + component, None, with_date=True)
-                sigma_df.to_sql('sigma_' + component, engine_out.engine, if_exists='replace')
+                # Write raw data, corrected data and sigmas in a single transaction
+                with engine_out.engine.begin() as conn:
+                    comp_df.to_sql('raw_' + component, conn, if_exists='replace')
+                    for cnt, statname in enumerate(self.names):
+                        comp_df.loc[:,statname] -= A[:,cnt]
+                    comp_df.to_sql(component, conn, if_exists='replace')
+                    sigma_df.to_sql('sigma_' + component, conn, if_exists='replace')
         
         return
 
@@ -558,10 +568,17 @@ class Network:
                 filt_data[i] = np.nanmedian(dat[i-halfWindow:i+halfWindow+1])
                 halfWindow += 1
 
-            # Middle region
+            # Middle region. Use the rolling median from bottleneck if available,
+            # whose right-aligned windows are shifted back by halfWindow. Otherwise,
+            # take the median over a strided view of all full windows
             halfWindow = kernel_size // 2
-            for i in range(halfWindow, nobs - halfWindow):
-                filt_data[i] = np.nanmedian(dat[i-halfWindow:i+halfWindow+1])
+            if nobs >= kernel_size:
+                if bn is not None:
+                    rolling = bn.move_median(dat, window=kernel_size, min_count=1)
+                    rolling = rolling[2*halfWindow:]
+                else:
+                    rolling = np.nanmedian(sliding_window_view(dat, kernel_size), axis=1)
+                filt_data[halfWindow:nobs-halfWindow] = rolling
 
             # Ending region
             halfWindow -= 1
@@ -576,21 +593,37 @@ class Network:
         """
         Compute the distance between two stations.
         """
-        ind1 = (self.name == statname1.lower()).nonzero()[0]
-        ind2 = (self.name == statname2.lower()).nonzero()[0]
-        assert len(ind1) == 1, 'Cannot find first station'
-        assert len(ind2) == 1, 'Cannot find second station'
-
-        # Retrieve lat/lon
-        lon1, lat1 = self.lon[ind1[0]], self.lat[ind1[0]]
-        lon2, lat2 = self.lon[ind2[0]], self.lat[ind2[0]]
-
-        # Convert to XYZ and compute Cartesian distance
-        from topoutil import llh2xyz
-        X1 = llh2xyz(lat1, lon1, 0.0, deg=True).squeeze()
-        X2 = llh2xyz(lat2, lon2, 0.0, deg=True).squeeze()
-        dX = np.linalg.norm(X2 - X1)
-        return dX
+        dist = self.pairwiseDistances([statname1.lower(), statname2.lower()],
+                                      elevation=False)
+        return dist[0,1]
+
+
+    def pairwiseDistances(self, statnames=None, elevation=True):
+        """
+        Compute the Cartesian distances between all pairs of stations in a list of
+        station names. If statnames is None, uses all stations in the network. If
+        elevation is False, the stations are placed at zero height.
+        """
+        import topoutil as tu
+        from scipy.spatial.distance import cdist
+
+        # Get the indices of the stations
+        if statnames is None:
+            ind = slice(None)
+        else:
+            lookup = {name: i for i, name in enumerate(self.names)}
+            for name in statnames:
+                assert name in lookup, 'Cannot find station %s' % name
+            ind = np.array([lookup[name] for name in statnames], dtype=int)
+
+        # Convert station coordinates to XYZ at once
+        rad = np.pi / 180.0
+        lat, lon = self.lat[ind], self.lon[ind]
+        elev = self.elev[ind] if elevation else np.zeros_like(lat)
+        X = np.stack(tu.llh2xyz(lat*rad, lon*rad, elev), axis=-1)
+
+        # Compute distances between all pairs of stations
+        return cdist(X, X)
 
 
     def getNetworkBounds(self, padding=5):
@@ -10,8 +10,8 @@ import os
 
 from pygeodesy.db.Engine import Engine
 from pygeodesy.model import Model
-
-from giant.utilities import timefn
+from pygeodesy.model.utils import load_collection
+from pygeodesy.utilities import bcastArray, blockPartition
 
 
 def partitionData(solver, network, opts, comm):
@@ -32,15 +32,25 @@ def partitionData(solver, network, opts, comm):
         datArr, wgtArr = network.getDataArrays(order='columns', sigmas=opts.sigmas,
             components=[opts.component], scale=opts.scale)
         # Read in time function
-        collection, iCm = load_collection(network.dates, opts.user)
+        collection, iCm = load_collection(network.dates, opts.user,
+                                          identity_prior=True)
     else:
-        datArr = wgtArr = collection = iCm = None
+        collection = iCm = None
 
+    # Every rank knows the data shape (dates x stations), so the arrays are
+    # broadcast directly into typed buffers without pickling. The shape of the
+    # master arrays is checked on all ranks so that none is left waiting in Bcast
     if rank == 0: print('Broadcasting data')
-    datArr = comm.bcast(datArr, root=0)
-    wgtArr = comm.bcast(wgtArr, root=0)
+    arr_shape = (len(network.dates), network.nstat)
+    root_shape = comm.bcast(datArr.shape if rank == 0 else None, root=0)
+    assert root_shape == arr_shape, 'Data array shape does not match network'
+    if rank != 0:
+        datArr = np.empty(arr_shape, dtype=np.float64)
+        wgtArr = np.empty(arr_shape, dtype=np.float64)
+    comm.Bcast([datArr, MPI.DOUBLE], root=0)
+    comm.Bcast([wgtArr, MPI.DOUBLE], root=0)
     collection = comm.bcast(collection, root=0)
-    iCm = comm.bcast(iCm, root=0)
+    iCm = bcastArray(iCm, comm=comm, root=0)
 
     # Create a model for handling the time function
     model = Model(network.dates, collection=collection)
@@ -171,19 +181,15 @@ def distributeSolutions(mvec, engine, model, network, opts):
         'transient': {'DATE': network.dates}, 
         'full': {'DATE': network.dates}}
 
-    # Dictionary for coefficients
-    coeffs = {}
-    
-    # Loop over stations
+    # Make predictions for all stations at once; parameters are interleaved by station
     nstat = network.nstat
-    for cnt, statname in enumerate(network.names):
-        # Make predictions
-        mstat = mvec[cnt::nstat]
-        fit_dict = model.predict(mstat)
-        for ftype in ('secular', 'seasonal', 'step', 'transient', 'full'):
-            results[ftype][statname] = fit_dict[ftype]
-        # Save coefficients
-        coeffs[statname] = mstat
+    mstat = np.asarray(mvec).reshape(-1, nstat)
+    fit_dict = model.predict(mstat, sigma=False)
+    for ftype in ('secular', 'seasonal', 'step', 'transient', 'full'):
+        results[ftype].update(zip(network.names, fit_dict[ftype].T))
+
+    # Dictionary for coefficients
+    coeffs = dict(zip(network.names, mstat.T))
 
     # Write results to database
     for ftype in ('secular', 'seasonal', 'step', 'transient', 'full'):
@@ -198,60 +204,9 @@ def distributeSolutions(mvec, engine, model, network, opts):
     return
 
 
-def load_collection(dates, userfile):
-    """
-    Load the collection and the prior covariance matrix.
-    """
-    print('Loading collection')
-    import imp
-    try:
-        collfun = imp.load_source('build', userfile)
-        collection = collfun.build(dates)
-    except:
-        collection = loadDefaultCollection(dates)
-    npar = len(collection)
-
-    # Also try to build a prior covariance matrix
-    try:
-        collfun = imp.load_source('build', inputs.user)
-        Cm = collfun.computeCm(collection)
-        iCm = np.linalg.inv(Cm)
-    except:
-        iCm = np.eye(npar)
-
-    return collection, iCm
-
-
-def loadDefaultCollection(t):
-    """
-    Load default time function collection.
-    """
-    tstart, tend = t[0], t[-1]
-
-    collection = timefn.TimefnCollection()
-    poly = timefn.fnmap['poly']
-    ispl = timefn.fnmap['isplineset']
-    periodic = timefn.fnmap['periodic']
-
-    collection.append(poly(tref=tstart, order=1, units='years'))
-    collection.append(periodic(tref=tstart, units='weeks', period=0.5, tmin=tstart, tmax=tend))
-    collection.append(periodic(tref=tstart, units='weeks', period=1.0, tmin=tstart, tmax=tend))
-    for nspl in [32, 16, 8, 4]:
-        collection.append(ispl(order=3, num=nspl, units='years', tmin=tstart, tmax=tend))
-
-    return collection
-
-
 def getSendcnts(N, comm):
-    rank = comm.Get_rank()
-    size = comm.Get_size()
-    nominal_load = N // size
-    if rank == size - 1:
-        procN = N - rank * nominal_load
-    else:
-        procN = nominal_load
-    sendcnts = comm.allgather(procN)
-    return sendcnts
+    sendcnts, _ = blockPartition(N, comm.Get_size())
+    return sendcnts.tolist()
 
 
 def saveData(solver, model, rank, component):
@@ -9,7 +9,8 @@ import sys
 import pygeodesy as pg
 import pyre
 
-from giant.utilities import timefn
+from pygeodesy.model.utils import load_collection
+from pygeodesy.utilities import bcastArray
 
 class ModelFit(pg.components.task, family='pygeodesy.modelfit'):
     """
@@ -101,7 +102,7 @@ class ModelFit(pg.components.task, family='pygeodesy.modelfit'):
         # Broadcast
         print('Broadcasting data')
         collection = comm.bcast(collection, root=0)
-        iCm = comm.bcast(iCm, root=0)
+        iCm = bcastArray(iCm, comm=comm, root=0)
 
         # Create a model for handling the time function
         model = pg.model.Model(network.dates, collection=collection, t0=self.t0, tf=self.tf)
@@ -141,6 +142,7 @@ class ModelFit(pg.components.task, family='pygeodesy.modelfit'):
             nstd = self.nstd
             coeff_dat = {}
             coeff_sigma_dat = {}
+            fit_dict = {}
             for statcnt, statname in enumerate(network.sub_names):
 
                 # Scale data
@@ -187,7 +189,7 @@ class ModelFit(pg.components.task, family='pygeodesy.modelfit'):
                     coeff_sigma_dat[statname] = np.sqrt(np.diag(model.Cm))
 
                     # Model performs reconstruction (only for detecting outliers)
-                    fit_dict = model.predict(mvec)
+                    model.predict(mvec, out=fit_dict, sigma=False)
                     filt_signal = fit_dict['full']
                     
                     # Compute misfit and standard deviation
@@ -250,13 +252,12 @@ class ModelFit(pg.components.task, family='pygeodesy.modelfit'):
                     'transient': {'DATE': network.dates},
                     'full': {'DATE': network.dates}}
 
-                # Compute the model fits
+                # Compute the model fits for all stations at once
                 coeff_df, coeff_sigma_df = results[0], results[1]
-                for statname in keep_stations:
-                    m = coeff_df[statname].values.squeeze()
-                    fit_dict = model.predict(m, sigma=False)
+                if len(keep_stations) > 0:
+                    fit_dict = model.predict(coeff_df[keep_stations].values, sigma=False)
                     for ftype in ('secular', 'seasonal', 'step', 'transient', 'full'):
-                        out_dict[ftype][statname] = fit_dict[ftype]
+                        out_dict[ftype].update(zip(keep_stations, fit_dict[ftype].T))
 
                 # Write results to database
                 for i in range(Ndf):
@@ -308,52 +309,9 @@ class ModelFit(pg.components.task, family='pygeodesy.modelfit'):
                 comm.send(keep_stations, dest=0, tag=87)
                 del data_df, sigma_df
 
-            comm.Barrier()
-
-
-def load_collection(dates, userfile):
-    """
-    Load the collection and the prior covariance matrix.
-    """
-    print('Loading collection')
-    import imp
-    try:
-        collfun = imp.load_source('build', userfile)
-        collection = collfun.build(dates)
-    except:
-        print(' - loading default')
-        collection = loadDefaultCollection(dates)
-    npar = len(collection)
-
-    # Also try to build a prior covariance matrix
-    try:
-        collfun = imp.load_source('build', inputs.user)
-        Cm = collfun.computeCm(collection)
-        iCm = np.linalg.inv(Cm)
-    except:
-        iCm = None
-
-    return collection, iCm
-
-
-def loadDefaultCollection(t):
-    """
-    Load default time function collection.
-    """
-    tstart, tend = t[0], t[-1]
-
-    collection = timefn.TimefnCollection()
-    poly = timefn.fnmap['poly']
-    ispl = timefn.fnmap['isplineset']
-    periodic = timefn.fnmap['periodic']
-
-    collection.append(poly(tref=tstart, order=1, units='years'))
-    collection.append(periodic(tref=tstart, units='weeks', period=0.5, tmin=tstart, tmax=tend))
-    collection.append(periodic(tref=tstart, units='weeks', period=1.0, tmin=tstart, tmax=tend))
-    for nspl in [32, 16, 8, 4]:
-        collection.append(ispl(order=3, num=nspl, units='years', tmin=tstart, tmax=tend))
-
-    return collection
+            # No barrier here: workers move on to fitting the next component while
+            # the master writes results. The barrier before the sends keeps the
+            # components from mixing.
 
 
 # end of file
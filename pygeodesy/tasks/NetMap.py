@@ -91,7 +91,8 @@ class NetMap(pg.components.task, family='pygeodesy.netmap'):
 
                         # Try to read model data
                         fit = pg.view.utils.model_and_detrend(data, engine, name_closest,
-                                                              comp, self.model)
+                                                              comp, self.model,
+                                                              tables=network.tables)
 
                         # Compute statistics of residuals if a model fit was computed
                         fit_finite = np.isfinite(fit).nonzero()[0]
@@ -1,7 +1,6 @@
 #-*- coding: utf-8 -*_
 
 import numpy as np
-import pandas as pd
 import pygeodesy as pg
 import pyre
 import matplotlib.pyplot as plt
@@ -86,16 +85,30 @@ class Plot(pg.components.task, family='pygeodesy.plot'):
             statnames = self.stations.split()
 
         # Read data after checking for existence of component
+        db_components = engine.components()
         if self.component == 'all':
-            components = engine.components()
-        elif self.component not in engine.components():
-            components = [engine.components()[0]]
+            components = db_components
+        elif self.component not in db_components:
+            components = [db_components[0]]
         else:
             components = [self.component]
 
         # Read data array
         dates = engine.dates()
 
+        # Get set of tables in the database once for all stations
+        tables = frozenset(engine.tables(asarray=True))
+
+        # Read the data and the model tables needed for the components once for all
+        # stations. The "raw" data are only plotted with the model
+        table_names = []
+        for component in components:
+            table_names.append(component)
+            if not self.residual and 'raw_' + component in tables:
+                table_names.append('raw_' + component)
+            table_names.extend(pg.view.utils.model_tables(component, self.model, tables))
+        cache = pg.view.utils.read_tables(engine, table_names, statnames)
+
         # Determine plotting bounds
         tstart = np.datetime64(self.tstart) if self.tstart is not None else None
         tend = np.datetime64(self.tend) if self.tend is not None else None
@@ -110,26 +123,24 @@ class Plot(pg.components.task, family='pygeodesy.plot'):
         if self.save and not os.path.isdir(self.output_dir):
             os.makedirs(self.output_dir)
 
-        # Loop over stations
+        # Loop over stations, re-using the same figure
         for statname in statnames:
 
-            # Check if we had previously closed the figure and need to make new one
-            if fig is None and axes is None:
-                fig, axes = plt.subplots(nrows=len(components), figsize=figsize)
-                if type(axes) not in (list, np.ndarray):
-                    axes = [axes]
+            # Clear the plots of the previous station
+            for ax in axes:
+                ax.clear()
 
             print(statname)
 
             for ax, component in zip(axes, components):
 
-                # Read data
-                data = pd.read_sql_table(component, engine.engine, columns=[statname,])
-                data = data[statname].values.squeeze()
+                # Get data
+                data = cache[component][statname].values.copy()
                 
                 # Try to read model data
                 fit = pg.view.utils.model_and_detrend(data, engine, statname,
-                                                      component, self.model)
+                                                      component, self.model, tables=tables,
+                                                      cache=cache)
 
                 # Remove means
                 dat_mean = np.nanmean(data)
@@ -150,9 +161,7 @@ class Plot(pg.components.task, family='pygeodesy.plot'):
 
                     # Also try to read "raw" data (for CME results)
                     try:
-                        raw = pd.read_sql_table('raw_' + component, 
-                            engine.engine, columns=[statname,])
-                        raw = raw.values.squeeze() - dat_mean
+                        raw = cache['raw_' + component][statname].values - dat_mean
                         ax.plot(dates, raw, 'sg', alpha=0.7, zorder=9)
                     except:
                         pass
@@ -168,12 +177,17 @@ class Plot(pg.components.task, family='pygeodesy.plot'):
             axes[-1].set_xlabel('Year', fontsize=18)
             
             if self.save:
-                plt.savefig('%s/%s_%s.png' % (self.output_dir, statname, component), 
+                fig.savefig('%s/%s_%s.png' % (self.output_dir, statname, component), 
                     dpi=200, bbox_inches='tight')
-                fig = axes = None
             else:
                 plt.show()
-            plt.close('all') 
+                # Make a new figure if the window was closed
+                if not plt.fignum_exists(fig.number):
+                    fig, axes = plt.subplots(nrows=len(components), figsize=figsize)
+                    if type(axes) not in (list, np.ndarray):
+                        axes = [axes]
+
+        plt.close(fig)
 
 
 # end of file
@@ -31,6 +31,9 @@ class Subnet(pg.components.task, family='pygeodesy.subnet'):
     scale = pyre.properties.float(default=1.0)
     scale.doc = 'Scale observations by factor (default: 1.0)'
 
+    workers = pyre.properties.int(default=1)
+    workers.doc = 'Number of processes for subsetting components in parallel (default: 1)'
+
     @pyre.export
     def main(self, plexus, argv):
         """
@@ -74,7 +77,7 @@ class Subnet(pg.components.task, family='pygeodesy.subnet'):
             plon, plat = np.loadtxt(self.poly, unpack=True)
             # Make a path object to compute mask
             poly = Path(np.column_stack((plon, plat)))
-            mask = poly.contains_points(list(zip(lon, lat)))
+            mask = poly.contains_points(np.column_stack((lon, lat)))
             # Subset stations
             stations = names[mask]
 
@@ -90,7 +93,7 @@ class Subnet(pg.components.task, family='pygeodesy.subnet'):
 
         # Subset the data table using station list
         interface.subset_table(stations, engine_out, tstart=self.tstart, tend=self.tend,
-                               filelist=files, scale=self.scale)
+                               filelist=files, scale=self.scale, workers=self.workers)
         
 
 # end of file
@@ -58,7 +58,7 @@ def selectDataClass(h5file):
     import h5py
     with h5py.File(h5file, 'r') as fid:
         try:
-            stype = fid['dtype'].value
+            stype = fid['dtype'][()]
             if stype == 'wells':
                 from .Wells import Wells
                 data = Wells()
@@ -185,11 +185,10 @@ def partitionStations(data, comm=None, strategy='stations'):
     """
     Utility function for determining partitioning strategy.
     """
-    # Save the communicator and get rank and size
+    # Save the communicator and get size
     from mpi4py import MPI
     comm = comm or MPI.COMM_WORLD
     size = comm.Get_size()
-    rank = comm.Get_rank()
 
     # Determine partitioning strategy
     if isinstance(strategy, int):
@@ -205,14 +204,49 @@ def partitionStations(data, comm=None, strategy='stations'):
         raise NotImplementedError('Argument strategy must be int or str')
 
     # Do the partitioning
-    nominal_load = N // size
-    if rank == size - 1:
-        procN = N - rank * nominal_load
+    sendcnts, _ = blockPartition(N, size)
+
+    return sendcnts.tolist()
+
+
+def blockPartition(N, size):
+    """
+    Split N items into size contiguous blocks whose sizes differ by at most one. Every
+    rank can compute the partition independently, so no communication is needed.
+    Returns the block sizes and the starting offsets (with N as the final offset).
+    """
+    counts = np.full(size, N // size, dtype=int)
+    counts[:N % size] += 1
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    return counts, offsets
+
+
+def bcastArray(arr, comm=None, root=0):
+    """
+    Broadcast a NumPy array from the root rank using a typed (buffer-based) Bcast.
+    Only the shape and dtype are pickled. Returns None on every rank if the array
+    is None on the root.
+    """
+    from mpi4py import MPI
+    comm = comm or MPI.COMM_WORLD
+    rank = comm.Get_rank()
+
+    # Broadcast the array header first
+    if rank == root and arr is not None:
+        arr = np.ascontiguousarray(arr)
+        header = (arr.shape, arr.dtype.str)
     else:
-        procN = nominal_load
-    sendcnts = comm.allgather(procN)
+        header = None
+    header = comm.bcast(header, root=root)
+    if header is None:
+        return None
+
+    # Allocate buffer on the other ranks and broadcast the data
+    if rank != root:
+        arr = np.empty(header[0], dtype=header[1])
+    comm.Bcast(arr, root=root)
 
-    return sendcnts
+    return arr
 
 
 def appendSeasonalDictionary(G, G_mod_ref, data):
@@ -300,4 +334,21 @@ def datestr2tdec(yy=0, mm=0, dd=0, hour=0, minute=0, sec=0, microsec=0,
         return float(yy) + tdelta.total_seconds() / (365.0 * 86400)
 
 
+def dates2tdec(dates):
+    """
+    Convert an array of dates (datetime objects or datetime64) to decimal years. This is
+    a vectorized version of datestr2tdec, with the same leap year rule, that also
+    ignores fractional seconds.
+    """
+    # Truncate to whole seconds and get the start of each year
+    dates = np.asarray(dates).astype('datetime64[s]')
+    yearStart = dates.astype('datetime64[Y]')
+    yy = yearStart.astype(int) + 1970
+    # Compute number of seconds elapsed since start of year
+    tdelta = (dates - yearStart.astype('datetime64[s]')).astype(float)
+    # Convert to decimal year and account for leap year
+    ndays = np.where(yy % 4 == 0, 366.0, 365.0)
+    return yy + tdelta / (ndays * 86400)
+
+
 # end of file 
@@ -3,16 +3,42 @@
 import pandas as pd
 import numpy as np
 
-def model_and_detrend(data, engine, statname, component, model):
+def read_tables(engine, table_names, statnames):
+    """
+    Read the columns for a list of stations from several tables, with a single query
+    per table. Returns a dictionary of data frames keyed by table name. Stations that
+    are missing from a table are skipped, so the frame is empty if none are present.
+    """
+    statnames = list(dict.fromkeys(statnames))
+    cache = {}
+    for table in table_names:
+        columns = set(pd.read_sql_query('SELECT * FROM `%s` LIMIT 0;' % table,
+                                        engine.engine).columns)
+        cols = [name for name in statnames if name in columns]
+        if len(cols) > 0:
+            cache[table] = engine.read_table(table, columns=cols)
+        else:
+            cache[table] = pd.DataFrame()
+    return cache
 
-    # Get list of tables in the database
-    tables = engine.tables(asarray=True)
 
-    # Keys to look for
-    model_comp = '%s_%s' % (model, component) if model != 'filt' else 'None'
-    filt_comp = 'filt_' + component
+def model_tables(component, model, tables):
+    """
+    Return the names of the tables in a set of tables that model_and_detrend reads
+    for a given component and model.
+    """
+    if model != 'filt' and '%s_%s' % (model, component) in tables:
+        names = ['full_' + component] + ['%s_%s' % (ftype, component)
+                                         for ftype in _parts_to_remove(model)]
+    else:
+        names = ['filt_' + component]
+    return [name for name in names if name in tables]
 
-    # Construct list of model components to remove (if applicable)
+
+def _parts_to_remove(model):
+    """
+    Return the list of model components to remove from the full model (if applicable).
+    """
     if model == 'secular':
         parts_to_remove = ['seasonal', 'transient', 'step']
     elif model == 'seasonal':
@@ -25,20 +51,45 @@ def model_and_detrend(data, engine, statname, component, model):
         parts_to_remove = []
     else:
         assert False, 'Unsupported model component %s' % model
+    return parts_to_remove
+
+
+def model_and_detrend(data, engine, statname, component, model, tables=None, cache=None):
+
+    # Get set of tables in the database if not provided
+    if tables is None:
+        tables = frozenset(engine.tables(asarray=True))
+
+    # Read a station column from the cache of tables (from read_tables) if available.
+    # Stations missing from a cached table raise a ValueError, like a direct read
+    def read_station(table):
+        if cache is not None and table in cache:
+            if statname not in cache[table]:
+                raise ValueError('Station %s not in table %s' % (statname, table))
+            return cache[table][statname].values.copy()
+        return engine.read_table(table, columns=[statname,])[statname].values
+
+    # Keys to look for
+    model_comp = '%s_%s' % (model, component) if model != 'filt' else 'None'
+    filt_comp = 'filt_' + component
+
+    # Construct list of model components to remove (if applicable)
+    parts_to_remove = _parts_to_remove(model)
 
-    # Make the model and detrend the data
+    # Make the model and detrend the data. Stations without a model keep a NaN fit
     fit = np.nan * np.ones_like(data)
     if model_comp in tables:
 
         # Read full model data
-        fit = pd.read_sql_table('full_' + component, engine.engine,
-            columns=[statname,]).values.squeeze()
+        try:
+            fit = read_station('full_' + component)
+        except ValueError:
+            return fit
 
         # Remove parts we do not want
         for ftype in parts_to_remove:
             try:
-                signal = pd.read_sql_table('%s_%s' % (ftype, component), engine.engine,
-                                           columns=[statname,]).values.squeeze()
+                signal = read_station('%s_%s' % (ftype, component))
                 fit -= signal
                 data -= signal
                 print('removed', ftype)
@@ -46,8 +97,10 @@ def model_and_detrend(data, engine, statname, component, model):
                 pass
 
     elif filt_comp in tables and model_comp not in tables:
-        fit = pd.read_sql_table('filt_%s' % component, engine.engine,
-                                columns=[statname,]).values.squeeze()
+        try:
+            fit = read_station('filt_%s' % component)
+        except ValueError:
+            pass
 
     return fit
 